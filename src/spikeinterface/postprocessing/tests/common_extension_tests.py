@@ -1,16 +1,42 @@
 from __future__ import annotations
 
+import os
+import copy
 import pytest
 import shutil
+import inspect
+import hashlib
+import functools
+from pathlib import Path
 import numpy as np
 
+import spikeinterface
+import spikeinterface.core.generate
 from spikeinterface.core import generate_ground_truth_recording
+from spikeinterface.core import BinaryFolderRecording, NumpyFolderSorting
 from spikeinterface.core import create_sorting_analyzer, load_sorting_analyzer
 from spikeinterface.core import estimate_sparsity
 
+# SortingAnalyzer objects in memory with the dependencies of an extension already computed,
+# keyed by (extension_name, sparse). They are copied into the requested format by each test.
+_dep_cache = {}
 
-def get_dataset():
-    recording, sorting = generate_ground_truth_recording(
+# (sparse, format) cases run by `AnalyzerExtensionCommonTestSuite.run_extension_tests()`
+EXTENSION_TEST_CASES = [(sparse, format) for sparse in (True, False) for format in ("memory", "binary_folder", "zarr")]
+
+# set SPIKEINTERFACE_TEST_NOCACHE=1 to generate the dataset in memory instead of loading it from the pytest cache
+# (the cached dataset is keyed on spikeinterface.core.generate, for other changes use it or `pytest --cache-clear`)
+NO_DATASET_CACHE = os.getenv("SPIKEINTERFACE_TEST_NOCACHE") == "1"
+
+
+def get_dataset(cache_folder=None):
+    """
+    Generate the ground truth recording and sorting used by the extension tests.
+
+    If `cache_folder` is given, the dataset is saved there on the first call (binary recording
+    and numpy folder sorting) and memmaped on the next calls, including in later pytest sessions.
+    """
+    dataset_kwargs = dict(
         durations=[15.0, 5.0],
         sampling_frequency=24000.0,
         num_channels=6,
@@ -29,9 +55,65 @@ def get_dataset():
         noise_kwargs=dict(noise_levels=5.0, strategy="tile_pregenerated"),
         seed=2205,
     )
+
+    if cache_folder is None:
+        return generate_ground_truth_recording(**dataset_kwargs)
+
+    # the version and the source of the generators are part of the key, so that a change of the generated
+    # dataset (between releases or during development) does not load a stale cached dataset
+    generate_source = inspect.getsource(spikeinterface.core.generate)
+    key_str = repr((spikeinterface.__version__, generate_source, sorted(dataset_kwargs.items())))
+    key = hashlib.sha1(key_str.encode()).hexdigest()[:12]
+    dataset_folder = Path(cache_folder) / f"gt_{key}"
+    # written once both the recording and the sorting are saved
+    complete_file = dataset_folder / "complete"
+
+    if not complete_file.exists():
+        recording, sorting = generate_ground_truth_recording(**dataset_kwargs)
+
+        # the dataset is saved in a temporary folder renamed at the end, so that an interrupted run
+        # or a concurrent pytest-xdist worker never sees a partial dataset
+        tmp_folder = Path(cache_folder) / f"gt_{key}_tmp{os.getpid()}"
+        if tmp_folder.exists():
+            shutil.rmtree(tmp_folder)
+        recording.save(folder=tmp_folder / "recording", format="binary")
+        sorting.save(folder=tmp_folder / "sorting", format="numpy_folder")
+        (tmp_folder / "complete").touch()
+
+        if dataset_folder.exists() and not complete_file.exists():
+            # leftover of an older cache layout or of a failed rename
+            shutil.rmtree(dataset_folder)
+        try:
+            tmp_folder.rename(dataset_folder)
+        except OSError:
+            # another worker saved the dataset first
+            shutil.rmtree(tmp_folder)
+
+    recording = BinaryFolderRecording(dataset_folder / "recording")
+    sorting = NumpyFolderSorting(dataset_folder / "sorting")
+
     return recording, sorting
 
 
+@functools.lru_cache(maxsize=1)
+def _get_dataset_and_sparsity(cache_folder):
+    """
+    Dataset and sparsity shared by all subclasses of `AnalyzerExtensionCommonTestSuite`.
+    """
+    recording, sorting = get_dataset(cache_folder=cache_folder)
+    sparsity = estimate_sparsity(sorting, recording, method="radius", radius_um=20)
+    return recording, sorting, sparsity
+
+
+@functools.lru_cache
+def _get_dependency_names(extension_class):
+    """
+    Names of the extensions to compute before `extension_class`.
+    For alternative dependencies ("random_spikes|waveforms") the first one is used.
+    """
+    return tuple(dependency_name.split("|")[0] for dependency_name in extension_class.depend_on)
+
+
 class AnalyzerExtensionCommonTestSuite:
     """
     Common tests with class approach to compute extension on several cases,
@@ -48,7 +130,10 @@ class AnalyzerExtensionCommonTestSuite:
     When subclassed, a test function that parametrises arguments
     that are passed to the `sorting_analyzer.compute()` can be setup.
     This must call `run_extension_tests()`  which sets up a `sorting_analyzer`
-    with the relevant format and sparsity. This also automatically precomputes
+    with the relevant format and sparsity. Test functions named `test_extension`
+    are automatically parametrized over the (sparse, format) cases, so that each
+    case is a separate test (and can run in parallel with pytest-xdist).
+    This also automatically precomputes
     extension dependencies with default params, Then, `check_one()` is called
     which runs the compute function with the passed params and tests that:
 
@@ -57,8 +142,11 @@ class AnalyzerExtensionCommonTestSuite:
     3) the correct units are sliced with the `select_units()` function.
     """
 
+    # the (sparse, format) case set by the `extension_test_case` fixture, None runs all cases
+    extension_case = None
+
     @pytest.fixture(autouse=True, scope="class")
-    def setUpClass(self, create_cache_folder):
+    def setUpClass(self, create_cache_folder, pytestconfig):
         """
         This method sets up the class once at the start of testing. It is
         in scope for the lifetime of te class and is reused across all
@@ -70,16 +158,37 @@ class AnalyzerExtensionCommonTestSuite:
         from the base object `__class__` to ensure the attributes
         are available to all subclass instances.
         """
-        self.__class__.recording, self.__class__.sorting = get_dataset()
-
-        self.__class__.sparsity = estimate_sparsity(
-            self.__class__.sorting, self.__class__.recording, method="radius", radius_um=20
-        )
+        # the dataset is kept in the pytest cache (.pytest_cache) across sessions, unless the cache
+        # plugin is disabled or SPIKEINTERFACE_TEST_NOCACHE=1
+        if not NO_DATASET_CACHE and getattr(pytestconfig, "cache", None) is not None:
+            dataset_cache_folder = pytestconfig.cache.mkdir("si_gt_dataset")
+        else:
+            dataset_cache_folder = None
+        recording, sorting, sparsity = _get_dataset_and_sparsity(dataset_cache_folder)
+        self.__class__.recording = recording
+        self.__class__.sorting = sorting
+        self.__class__.sparsity = sparsity
         self.__class__.cache_folder = create_cache_folder
+        # folder SortingAnalyzer objects already prepared, keyed by (extension_name, format, sparse)
+        self.__class__._prepared_cache = {}
 
-    def get_sorting_analyzer(self, recording, sorting, format="memory", sparsity=None, name=""):
-        sparse = sparsity is not None
+    def pytest_generate_tests(self, metafunc):
+        if metafunc.function.__name__ == "test_extension":
+            ids = [f"sparse{sparse}-{format}" for sparse, format in EXTENSION_TEST_CASES]
+            metafunc.parametrize("extension_test_case", EXTENSION_TEST_CASES, indirect=True, ids=ids)
+
+    @pytest.fixture(autouse=True)
+    def extension_test_case(self, request):
+        """
+        The (sparse, format) case of a parametrized `test_extension`, or None for other tests.
+        """
+        self.extension_case = getattr(request, "param", None)
+        return self.extension_case
 
+    def get_analyzer_folder(self, format, sparse, name=""):
+        """
+        Return the (emptied) folder used for a SortingAnalyzer with the given format, or None for "memory".
+        """
         if format == "memory":
             folder = None
         elif format == "binary_folder":
@@ -89,24 +198,66 @@ class AnalyzerExtensionCommonTestSuite:
         if folder and folder.exists():
             shutil.rmtree(folder)
 
+        return folder
+
+    def get_sorting_analyzer(self, recording, sorting, format="memory", sparsity=None, name=""):
+        sparse = sparsity is not None
+        folder = self.get_analyzer_folder(format, sparse, name=name)
+
         sorting_analyzer = create_sorting_analyzer(
             sorting, recording, format=format, folder=folder, sparse=False, sparsity=sparsity
         )
 
         return sorting_analyzer
 
+    def _copy_cached_analyzer(self, key, format, folder=None):
+        """
+        Copy the cached SortingAnalyzer with dependencies `_dep_cache[key]` to the requested format.
+        `AnalyzerExtension.copy()` shares the data dicts with the source analyzer, so the data
+        are deep copied to keep tests from modifying the cached analyzer.
+        """
+        sorting_analyzer = _dep_cache[key].save_as(format=format, folder=folder)
+        for extension in sorting_analyzer.extensions.values():
+            extension.data = copy.deepcopy(extension.data)
+
+        return sorting_analyzer
+
     def _prepare_sorting_analyzer(self, format, sparse, extension_class):
         # prepare a SortingAnalyzer object with depencies already computed
-        sparsity_ = self.sparsity if sparse else None
-        sorting_analyzer = self.get_sorting_analyzer(
-            self.recording, self.sorting, format=format, sparsity=sparsity_, name=extension_class.extension_name
-        )
-        sorting_analyzer.compute("random_spikes", max_spikes_per_unit=20, seed=2205)
+        # the dependencies are computed once in memory and the analyzer is then copied to the requested format
+        sparse = bool(sparse)
+        key = (extension_class.extension_name, sparse)
+        if key not in _dep_cache:
+            sparsity_ = self.sparsity if sparse else None
+            sorting_analyzer = self.get_sorting_analyzer(
+                self.recording, self.sorting, format="memory", sparsity=sparsity_
+            )
+            # all dependencies are computed in one call so that pipeline extensions share the traces reading
+            # note that an explicit "random_spikes" dependency is computed with default params
+            extensions = {"random_spikes": dict(max_spikes_per_unit=20, seed=2205)}
+            extensions.update({dependency_name: {} for dependency_name in _get_dependency_names(extension_class)})
+            sorting_analyzer.compute(extensions)
+
+            _dep_cache[key] = sorting_analyzer
+
+        if format == "memory":
+            return self._copy_cached_analyzer(key, format="memory")
+
+        # folder analyzers are copied from `_dep_cache` once per class and reused by the next tests
+        # of the class (for instance with other params), after removing the extension under test
+        # `_prepared_cache` is created by `setUpClass()`, tests run outside pytest use an instance cache
+        if "_prepared_cache" not in self.__class__.__dict__ and "_prepared_cache" not in self.__dict__:
+            self._prepared_cache = {}
+        prepared_key = (extension_class.extension_name, format, sparse)
+        sorting_analyzer = self._prepared_cache.get(prepared_key)
+        if sorting_analyzer is None:
+            folder = self.get_analyzer_folder(format, sparse, name=extension_class.extension_name)
+            sorting_analyzer = self._copy_cached_analyzer(key, format=format, folder=folder)
+            self._prepared_cache[prepared_key] = sorting_analyzer
 
-        for dependency_name in extension_class.depend_on:
-            if "|" in dependency_name:
-                dependency_name = dependency_name.split("|")[0]
-            sorting_analyzer.compute(dependency_name)
+        if sorting_analyzer.has_extension(extension_class.extension_name):
+            # remove the extension computed by a previous test
+            sorting_analyzer.delete_extension(extension_class.extension_name)
 
         return sorting_analyzer
 
@@ -160,14 +311,25 @@ class AnalyzerExtensionCommonTestSuite:
                 else:
                     continue
 
+    def run_extension_test_one(self, extension_class, params, sparse, format):
+        """
+        Perform all checks on the extension of interest with the passed
+        parameters for one sparsity and format.
+        """
+        print("sparse", sparse, format)
+        sorting_analyzer = self._prepare_sorting_analyzer(format, sparse, extension_class)
+        self._check_one(sorting_analyzer, extension_class, params)
+
     def run_extension_tests(self, extension_class, params):
         """
         Convenience function to perform all checks on the extension
         of interest with the passed parameters. Will perform tests
-        for sparsity and format.
+        for sparsity and format: only the case of the current test
+        when it is parametrized (`test_extension`), all cases otherwise.
         """
-        for sparse in (True, False):
-            for format in ("memory", "binary_folder", "zarr"):
-                print("sparse", sparse, format)
-                sorting_analyzer = self._prepare_sorting_analyzer(format, sparse, extension_class)
-                self._check_one(sorting_analyzer, extension_class, params)
+        if self.extension_case is not None:
+            cases = [self.extension_case]
+        else:
+            cases = EXTENSION_TEST_CASES
+        for sparse, format in cases:
+            self.run_extension_test_one(extension_class, params, sparse, format)
@@ -1,6 +1,7 @@
 import numpy as np
 import pytest
 
+from spikeinterface.core.sorting_tools import spike_vector_to_indices
 from spikeinterface.postprocessing.tests.common_extension_tests import AnalyzerExtensionCommonTestSuite
 
 from spikeinterface.postprocessing import ComputeAmplitudeScalings
@@ -26,12 +27,14 @@ class TestAmplitudeScalingsExtension(AnalyzerExtensionCommonTestSuite):
         )
         sorting_analyzer.compute("amplitude_scalings", handle_collisions=False)
 
-        spikes = sorting_analyzer.sorting.to_spike_vector()
+        spike_vector = sorting_analyzer.sorting.to_spike_vector(concatenated=False)
+        spike_indices = spike_vector_to_indices(spike_vector, sorting_analyzer.unit_ids, absolute_index=True)
 
         ext = sorting_analyzer.get_extension("amplitude_scalings")
+        all_scalings = ext.data["amplitude_scalings"]
 
-        for unit_index, unit_id in enumerate(sorting_analyzer.unit_ids):
-            mask = spikes["unit_index"] == unit_index
-            scalings = ext.data["amplitude_scalings"][mask]
+        for unit_id in sorting_analyzer.unit_ids:
+            inds = np.concatenate([spike_indices[segment_index][unit_id] for segment_index in spike_indices])
+            scalings = all_scalings[inds]
             median_scaling = np.median(scalings)
             np.testing.assert_array_equal(np.round(median_scaling), 1)
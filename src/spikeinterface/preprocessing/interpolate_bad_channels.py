@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import importlib.util
+
 import numpy as np
 
 from .basepreprocessor import BasePreprocessor, BasePreprocessorSegment
 from spikeinterface.core.core_tools import define_function_handling_dict_from_class
 from spikeinterface.preprocessing import preprocessing_tools
 
+numba_spec = importlib.util.find_spec("numba")
+if numba_spec is not None:
+    HAVE_NUMBA = True
+else:
+    HAVE_NUMBA = False
+
 
 class InterpolateBadChannelsRecording(BasePreprocessor):
     """
@@ -52,18 +60,24 @@ class InterpolateBadChannelsRecording(BasePreprocessor):
         self._good_channel_idxs = ~np.isin(np.arange(recording.get_num_channels()), self._bad_channel_idxs)
         self._bad_channel_idxs.setflags(write=False)
 
+        locations = recording.get_channel_locations()
+
         if sigma_um is None:
-            sigma_um = estimate_recommended_sigma_um(recording)
+            sigma_um = estimate_recommended_sigma_um(locations)
 
         if weights is None:
-            locations = recording.get_channel_locations()
             locations_good = locations[self._good_channel_idxs]
             locations_bad = locations[self._bad_channel_idxs]
             weights = preprocessing_tools.get_kriging_channel_weights(locations_good, locations_bad, sigma_um, p)
 
+        # match the weights to the traces dtype (float32 unless the recording is float64)
+        # so that the matrix product does not upcast every chunk to float64
+        weights_dtype = np.result_type(recording.get_dtype(), np.float32)
+        segment_weights = np.ascontiguousarray(weights, dtype=weights_dtype)
+
         for parent_segment in recording._recording_segments:
             rec_segment = InterpolateBadChannelsSegment(
-                parent_segment, self._good_channel_idxs, self._bad_channel_idxs, weights
+                parent_segment, self._good_channel_idxs, self._bad_channel_idxs, segment_weights
             )
             self.add_recording_segment(rec_segment)
 
@@ -86,31 +100,113 @@ class InterpolateBadChannelsSegment(BasePreprocessorSegment):
     def __init__(self, parent_recording_segment, good_channel_indices, bad_channel_indices, weights):
         BasePreprocessorSegment.__init__(self, parent_recording_segment)
 
-        self._good_channel_indices = good_channel_indices
         self._bad_channel_indices = bad_channel_indices
-        self._weights = weights
+
+        # for each channel, the column of `weights` used to interpolate it (-1 for good channels)
+        self._weight_columns = np.full(good_channel_indices.size, -1, dtype="int64")
+        self._weight_columns[bad_channel_indices] = np.arange(bad_channel_indices.size)
+
+        # kriging weights below threshold are zeroed, so each bad channel is only
+        # interpolated from a few neighbouring good channels
+        good_channel_inds = np.flatnonzero(good_channel_indices)
+        self._neighbour_indices = []
+        self._neighbour_weights = []
+        for column in range(weights.shape[1]):
+            (rows,) = np.nonzero(weights[:, column])
+            self._neighbour_indices.append(good_channel_inds[rows])
+            self._neighbour_weights.append(weights[rows, column])
+
+        if HAVE_NUMBA:
+            # flat (CSR-like) version of the neighbour lists for the numba kernel
+            self._neighbour_ptr = np.zeros(weights.shape[1] + 1, dtype="int64")
+            self._neighbour_ptr[1:] = np.cumsum([inds.size for inds in self._neighbour_indices])
+            self._neighbour_indices_flat = np.concatenate(self._neighbour_indices + [np.zeros(0, dtype="int64")])
+            self._neighbour_weights_flat = np.concatenate(self._neighbour_weights + [np.zeros(0, dtype=weights.dtype)])
 
     def get_traces(self, start_frame, end_frame, channel_indices):
+        if self._bad_channel_indices.size == 0:
+            # no bad channel, the segment is a pass-through
+            return self.parent_recording_segment.get_traces(start_frame, end_frame, channel_indices)
+
         if channel_indices is None:
             channel_indices = slice(None)
 
+        # only the requested channels are copied and only the requested bad channels are interpolated
+        weight_columns = self._weight_columns[channel_indices]
+        requested_bad = np.flatnonzero(weight_columns >= 0)
+
+        if requested_bad.size == 0:
+            # no bad channel requested, nothing to interpolate
+            return self.parent_recording_segment.get_traces(start_frame, end_frame, channel_indices)
+
         traces = self.parent_recording_segment.get_traces(start_frame, end_frame, slice(None))
 
-        traces = traces.copy()
+        # traces_out must be a new buffer: callers keep references to returned traces and
+        # parent traces can be read-only memmaps or views on the parent's own data
+        traces_out = traces[:, channel_indices]
+        if isinstance(channel_indices, slice):
+            traces_out = traces_out.copy()
+
+        if HAVE_NUMBA:
+            interpolate_bad_channels_numba = get_numba_interpolate_bad_channels()
+            interpolate_bad_channels_numba(
+                traces,
+                requested_bad,
+                weight_columns[requested_bad],
+                self._neighbour_ptr,
+                self._neighbour_indices_flat,
+                self._neighbour_weights_flat,
+                traces_out,
+            )
+        else:
+            for out_index in requested_bad:
+                column = weight_columns[out_index]
+                neighbour_traces = traces[:, self._neighbour_indices[column]]
+                traces_out[:, out_index] = neighbour_traces @ self._neighbour_weights[column]
+
+        return traces_out
+
+
+def get_numba_interpolate_bad_channels():
+    if hasattr(get_numba_interpolate_bad_channels, "_cached_numba_function"):
+        return get_numba_interpolate_bad_channels._cached_numba_function
+
+    import numba
+
+    @numba.jit(nopython=True, nogil=True, cache=False)
+    def interpolate_bad_channels_numba(
+        traces, out_indices, columns, neighbour_ptr, neighbour_indices, neighbour_weights, traces_out
+    ):
+        """
+        Fill the columns out_indices of traces_out with the weighted sum of the
+        neighbour channels in traces given by the weight columns.
+        """
+        num_samples = traces.shape[0]
+        for t in range(num_samples):
+            for i in range(out_indices.size):
+                column = columns[i]
+                value = 0.0
+                for k in range(neighbour_ptr[column], neighbour_ptr[column + 1]):
+                    value += traces[t, neighbour_indices[k]] * neighbour_weights[k]
+                traces_out[t, out_indices[i]] = value
 
-        traces[:, self._bad_channel_indices] = traces[:, self._good_channel_indices] @ self._weights
+    # Cache the compiled function
+    get_numba_interpolate_bad_channels._cached_numba_function = interpolate_bad_channels_numba
 
-        return traces[:, channel_indices]
+    return interpolate_bad_channels_numba
 
 
-def estimate_recommended_sigma_um(recording):
+def estimate_recommended_sigma_um(channel_locations):
     """
     Get the most common distance between channels on the y-axis
     """
-    y_sorted = np.sort(recording.get_channel_locations()[:, 1])
-    import scipy.stats
+    y_distances = np.diff(np.unique(channel_locations[:, 1]))
+    if y_distances.size == 0:
+        # all channels are on the same row, as scipy.stats.mode this gives nan
+        return np.nan
+    distances, counts = np.unique(y_distances, return_counts=True)
 
-    return scipy.stats.mode(np.diff(np.unique(y_sorted)), keepdims=False)[0]
+    return float(distances[np.argmax(counts)])
 
 
 interpolate_bad_channels = define_function_handling_dict_from_class(
@@ -173,6 +173,53 @@ def test_output_values():
     assert np.allclose(si_interpolated[:, 0], expected_ts, rtol=0, atol=1e-06)
 
 
+@pytest.mark.parametrize("use_numba", [True, False])
+def test_channel_subsets(use_numba, monkeypatch):
+    """
+    Check that requesting a subset of channels (with or without bad channels)
+    gives the same values as slicing the full interpolated traces, for both
+    the numba and the numpy implementations.
+    """
+    # the module is shadowed by the `interpolate_bad_channels` function in the package namespace
+    interpolate_bad_channels_module = importlib.import_module("spikeinterface.preprocessing.interpolate_bad_channels")
+
+    if use_numba and not interpolate_bad_channels_module.HAVE_NUMBA:
+        pytest.skip("numba is not installed")
+    monkeypatch.setattr(interpolate_bad_channels_module, "HAVE_NUMBA", use_numba)
+
+    recording = generate_recording(num_channels=16, durations=[1])
+    recording = spre.scale(recording, dtype="float32")
+    bad_channel_ids = recording.channel_ids[[0, 5, 11]]
+
+    si_interpolated_recording = spre.interpolate_bad_channels(recording, bad_channel_ids, sigma_um=20, p=1.3)
+    si_interpolated = si_interpolated_recording.get_traces()
+
+    for channel_indexes in ([5, 2, 0], [1, 2, 3], [11]):
+        channel_ids = recording.channel_ids[channel_indexes]
+        traces = si_interpolated_recording.get_traces(channel_ids=channel_ids)
+        assert np.allclose(traces, si_interpolated[:, channel_indexes], rtol=0, atol=1e-06)
+
+
+def test_no_bad_channels():
+    """
+    Without bad channels the traces are the ones of the parent recording.
+    """
+    recording = generate_recording(num_channels=8, durations=[1])
+    si_interpolated_recording = spre.interpolate_bad_channels(recording, bad_channel_ids=[], sigma_um=20, p=1.3)
+
+    assert np.array_equal(si_interpolated_recording.get_traces(), recording.get_traces())
+
+
+def test_estimate_sigma_um_single_row():
+    """
+    With all channels on one row there is no y distance, sigma_um is nan as with scipy.stats.mode.
+    """
+    from spikeinterface.preprocessing.interpolate_bad_channels import estimate_recommended_sigma_um
+
+    channel_locations = np.array([[0, 0], [20, 0], [40, 0]], dtype="float64")
+    assert np.isnan(estimate_recommended_sigma_um(channel_locations))
+
+
 # -------------------------------------------------------------------------------
 # Test Utils
 # -------------------------------------------------------------------------------